@@ -0,0 +1,348 @@
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow is only needed for the columnar engine mode
+    pa = None
+
+from cleaning_process import normalize_country
+from feature_engineering import FEATURES_TO_NORMALIZE
+from merge_datasets import COUNTRY_MAPPING
+import validation
+from atomic_io import save_csv, save_npy
+
+# Same missing value markers as pandas.read_csv, plus "None" used by the GDP and population files
+NULL_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+               "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+
+
+def read_csv(file_name):
+    """
+    A function that loads a CSV file as an Arrow table with the multithreaded reader
+    :param file_name: the path of the CSV file
+    :return: the Arrow table
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for the arrow engine mode (pip install pyarrow).")
+    return pa_csv.read_csv(
+        file_name,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(null_values=NULL_VALUES, strings_can_be_null=True),
+    )
+
+
+def to_numeric(array):
+    """
+    A function that coerces an Arrow array to float64, the unparsable values become null (like pd.to_numeric)
+    :param array: the Arrow array
+    :return: the numeric Arrow array
+    """
+    if pa.types.is_integer(array.type) and array.null_count:
+        # Like pandas, an integer column with missing values becomes float
+        return array.cast(pa.float64())
+    if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+        return array
+    array = pc.utf8_trim_whitespace(array.cast(pa.string()))
+    parsable = pc.match_substring_regex(array, r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+    return pc.if_else(parsable, array, pa.scalar(None, pa.string())).cast(pa.float64())
+
+
+def clean_values(array):
+    """
+    The columnar equivalent of cleaning_process.clean_df: only the digits and the dots are kept.
+    The column is first coerced to numeric, like main.data_acquisition does before the cleaning.
+    :param array: the Arrow array
+    :return: the float64 Arrow array
+    """
+    array = to_numeric(array)
+    if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+        return pc.abs(array.cast(pa.float64()))
+    digits = pc.replace_substring_regex(array.cast(pa.string()), r"[^0-9.]", "")
+    parsable = pc.match_substring_regex(digits, r"^(\d+\.?\d*|\.\d+)$")
+    return pc.if_else(parsable, digits, pa.scalar(None, pa.string())).cast(pa.float64())
+
+
+def map_countries(array, func):
+    """
+    A function that applies a python function to a string column once per distinct value
+    :param array: the Arrow array of the country names
+    :param func: the function applied to each name
+    :return: the mapped Arrow array
+    """
+    encoded = pc.dictionary_encode(array).combine_chunks()
+    mapped = pa.array([func(name) for name in encoded.dictionary.to_pylist()], pa.string())
+    return pc.take(mapped, encoded.indices)
+
+
+def canonical_country(name):
+    name = name.strip()
+    return COUNTRY_MAPPING.get(name, name)
+
+
+def value_codes(array):
+    """
+    A function that replaces each value by an integer code, equal values share the same code
+    :param array: the Arrow array
+    :return: the numpy array of the codes (the nulls share the last code)
+    """
+    encoded = pc.dictionary_encode(array).combine_chunks()
+    return pc.fill_null(encoded.indices, len(encoded.dictionary)).to_numpy(zero_copy_only=False)
+
+
+def keep_first(array, mask):
+    """
+    A function that marks the first occurrence of each value among the valid rows
+    :param array: the Arrow array of the keys
+    :param mask: the numpy mask of the valid rows
+    :return: the numpy mask of the rows to keep
+    """
+    codes = value_codes(array)
+    valid_rows = np.flatnonzero(mask)
+    _, first = np.unique(codes[valid_rows], return_index=True)
+    keep = np.zeros(len(mask), dtype=bool)
+    keep[valid_rows[first]] = True
+    return keep
+
+
+def validate(table, schema):
+    """
+    The columnar equivalent of validation.validate, compiled into a single numpy mask
+    :param table: the Arrow table
+    :param schema: a dict mapping column names to their rules
+    :return: the table with the numeric columns coerced, the mask of the valid rows
+             and a dict mapping each rule to its failing rows (same rule names as validation.validate)
+    """
+    failures = {}
+    for col, rules in schema.items():
+        if col not in table.column_names:
+            raise KeyError(f"Column '{col}' not found in the dataset.")
+        values = table.column(col)
+        missing = pc.is_null(values).to_numpy(zero_copy_only=False)
+        if rules.get("type") == "numeric":
+            values = to_numeric(values)
+            table = table.set_column(table.column_names.index(col), col, values)
+            failures[f"{col}: not numeric"] = pc.is_null(values).to_numpy(zero_copy_only=False) & ~missing
+        if rules.get("required"):
+            failures[f"{col}: missing"] = missing
+        if "min" in rules:
+            failures[f"{col}: below {rules['min']}"] = pc.fill_null(
+                pc.less(values, rules["min"]), False).to_numpy(zero_copy_only=False)
+        if "max" in rules:
+            failures[f"{col}: above {rules['max']}"] = pc.fill_null(
+                pc.greater(values, rules["max"]), False).to_numpy(zero_copy_only=False)
+
+    mask = np.ones(table.num_rows, dtype=bool)
+    for failed in failures.values():
+        mask &= ~failed
+
+    # Uniqueness is only checked among the rows that passed every other rule
+    for col, rules in schema.items():
+        if rules.get("unique"):
+            failed = mask & ~keep_first(table.column(col), mask)
+            failures[f"{col}: duplicate"] = failed
+            mask &= ~failed
+    return table, mask, failures
+
+
+def quarantine(table, mask, failures, dataset_name):
+    """
+    The columnar equivalent of validation.quarantine, only the rejected rows are converted to pandas
+    :param table: the validated Arrow table
+    :param mask: the mask of valid rows returned by validate()
+    :param failures: the failing rows of each rule returned by validate()
+    :param dataset_name: the name of the dataset, used to label the entries
+    :return: a DataFrame with one line per rejected row and the reasons it failed
+    """
+    rejected = np.flatnonzero(~mask)
+    reasons = ["; ".join(rule for rule, failed in failures.items() if failed[row]) for row in rejected]
+    return pd.DataFrame({
+        "Dataset": dataset_name,
+        "Row": rejected,
+        "Country": table.column("Country").take(rejected).to_pylist() if "Country" in table.column_names else None,
+        "Reasons": reasons,
+    })
+
+
+def duplicated_rows(table, col, candidates):
+    """
+    A function that selects every occurrence of the values seen more than once among the candidate rows
+    :param table: the Arrow table
+    :param col: the key column
+    :param candidates: the numpy mask of the rows considered
+    :return: the Arrow table of the duplicated rows, in their original order
+    """
+    codes = value_codes(table.column(col))
+    counts = np.bincount(codes[candidates], minlength=codes.max() + 1 if len(codes) else 0)
+    return table.filter(candidates & (counts[codes] > 1))
+
+
+def clean_demographics(table, output_dir, quarantine_entries):
+    table, mask, failures = validate(table, validation.DEMOGRAPHICS_SCHEMA)
+    quarantine_entries.append(quarantine(table, mask, failures, "Demographics"))
+    table = table.filter(mask)
+
+    original_country = table.column("Country")
+    country = map_countries(original_country, normalize_country)
+    changed = pc.not_equal(country, original_country)
+    mismatches = pa.table({"Original_Country": original_country.filter(changed), "Country": country.filter(changed)})
+    print('Number of mismatches:', mismatches.num_rows)
+    save_csv(mismatches.to_pandas(), os.path.join(output_dir, "name_mismatches.csv"), index=False)
+
+    return table.set_column(table.column_names.index("Country"), "Country", country)
+
+
+def clean_gdp(table, output_dir, quarantine_entries):
+    table = table.set_column(table.column_names.index("GDP_per_capita_PPP"), "GDP_per_capita_PPP",
+                             clean_values(table.column("GDP_per_capita_PPP")))
+
+    # Document the lines with a missing GDP, with their original country names
+    missing_gdp = table.filter(pc.is_null(table.column("GDP_per_capita_PPP")))
+    if missing_gdp.num_rows:
+        save_csv(missing_gdp.to_pandas(), os.path.join(output_dir, "dropped_gdp.csv"), index=False)
+
+    table = table.set_column(table.column_names.index("Country"), "Country",
+                             map_countries(table.column("Country"), normalize_country))
+    table, mask, failures = validate(table, validation.GDP_SCHEMA)
+    quarantine_entries.append(quarantine(table, mask, failures, "GDP"))
+
+    duplicates = duplicated_rows(table, "Country", mask | failures["Country: duplicate"])
+    if duplicates.num_rows:
+        save_csv(duplicates.to_pandas(), os.path.join(output_dir, "duplicates_gdp.csv"), index=False)
+    print('Number of duplicates:', duplicates.num_rows)
+    return table.filter(mask)
+
+
+def clean_population(table, output_dir, quarantine_entries):
+    table = table.set_column(table.column_names.index("Population"), "Population",
+                             clean_values(table.column("Population")))
+    table, mask, failures = validate(table, validation.POPULATION_SCHEMA)
+    quarantine_entries.append(quarantine(table, mask, failures, "Population"))
+
+    # The log is added before the duplicates are documented, like in the pandas path
+    population = table.column("Population")
+    log_population = pc.if_else(pc.greater(population, 0), pc.log10(population), pa.scalar(None, pa.float64()))
+    table = table.append_column("Log_Population", log_population)
+
+    duplicates = duplicated_rows(table, "Country", mask | failures["Country: duplicate"])
+    if duplicates.num_rows:
+        save_csv(duplicates.to_pandas(), os.path.join(output_dir, "duplicates_population.csv"), index=False)
+    print('Number of duplicates:', duplicates.num_rows)
+
+    table = table.filter(mask)
+    return table.set_column(table.column_names.index("Country"), "Country",
+                            map_countries(table.column("Country"), normalize_country))
+
+
+def merge(demo, gdp, pop, output_dir):
+    demo, gdp, pop = [table.set_column(table.column_names.index("Country"), "Country",
+                                       map_countries(table.column("Country"), canonical_country))
+                      for table in (demo, gdp, pop)]
+
+    # Keep the column order of the pandas join: Country first, then each dataset's columns in turn
+    columns = ["Country"] + [col for table in (demo, gdp, pop) for col in table.column_names if col != "Country"]
+    merged = demo.join(gdp, "Country", join_type="inner").join(pop, "Country", join_type="inner").select(columns)
+    print("Number of countries after inner join:", merged.num_rows)
+
+    all_countries = set()
+    for table in (demo, gdp, pop):
+        all_countries.update(pc.unique(table.column("Country")).to_pylist())
+    lost_countries = sorted(all_countries - set(merged.column("Country").to_pylist()))
+    lost_countries_file = os.path.join(output_dir, "lost_countries.csv")
+    save_csv(pd.DataFrame({"Country": lost_countries}), lost_countries_file, index=False)
+    print("Lost countries saved to:", lost_countries_file)
+
+    # Numeric columns: replace missing entries with the column mean, other columns: drop the rows
+    for i, field in enumerate(merged.schema):
+        column = merged.column(i)
+        if column.null_count == 0:
+            continue
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            merged = merged.set_column(i, field.name, pc.fill_null(column.cast(pa.float64()), pc.mean(column)))
+        else:
+            merged = merged.filter(pc.is_valid(column))
+
+    return merged.sort_by("Country").combine_chunks()
+
+
+def column_to_numpy(table, col):
+    # Single chunk without nulls, so numpy views the Arrow buffer directly
+    return table.column(col).chunk(0).to_numpy(zero_copy_only=True)
+
+
+def feature_engineering(merged):
+    gdp = column_to_numpy(merged, "GDP_per_capita_PPP")
+    population = column_to_numpy(merged, "Population")
+    if (gdp <= 0).any():
+        raise ValueError(
+            "All values in 'GDP_per_capita_PPP' must be positive for correct log transformation and calculations.")
+    if (population <= 0).any():
+        raise ValueError("All values in 'Population' must be positive for correct log transformation and calculations.")
+
+    merged = merged.append_column("TotalGDP", pa.array(gdp * population))
+    merged = merged.append_column("LogGDPperCapita", pa.array(np.log10(gdp)))
+    merged = merged.append_column("LogPopulation", pa.array(np.log10(population)))
+
+    # Z-score every feature straight into its column of the final matrix.
+    # Column-major, like DataFrame.values in the pandas path, so each column is contiguous
+    X = np.empty((merged.num_rows, len(FEATURES_TO_NORMALIZE)), order="F")
+    for j, col in enumerate(FEATURES_TO_NORMALIZE):
+        values = column_to_numpy(merged, col)
+        np.subtract(values, values.mean(), out=X[:, j])
+        X[:, j] /= values.std()
+    return merged, X
+
+
+def run_pipeline(filename_demographics, filename_gdp, filename_pop, output_dir="../output", raw_tables=None):
+    """
+    A function that runs the cleaning, merging and feature engineering on Arrow/NumPy buffers.
+    It writes the same files as the pandas path, except the acquisition files (see raw_tables).
+    :param filename_demographics: the demographics CSV file
+    :param filename_gdp: the GDP CSV file
+    :param filename_pop: the population CSV file
+    :param output_dir: the output directory
+    :param raw_tables: an optional list, filled with the demographics, GDP and population tables as loaded,
+                       with the numeric casts of main.load_datasets (for main.save_acquisition_files)
+    :return: the merged Arrow table with the features and the normalized feature matrix
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    demo = read_csv(filename_demographics)
+    gdp = read_csv(filename_gdp)
+    pop = read_csv(filename_pop)
+    if raw_tables is not None:
+        raw_tables.extend([
+            demo,
+            gdp.set_column(gdp.column_names.index("GDP_per_capita_PPP"), "GDP_per_capita_PPP",
+                           to_numeric(gdp.column("GDP_per_capita_PPP"))),
+            pop.set_column(pop.column_names.index("Population"), "Population", to_numeric(pop.column("Population"))),
+        ])
+
+    quarantine_entries = []
+    demo = clean_demographics(demo, output_dir, quarantine_entries)
+    gdp = clean_gdp(gdp, output_dir, quarantine_entries)
+    pop = clean_population(pop, output_dir, quarantine_entries)
+
+    # Save the rejected rows of the three datasets and the reasons they failed
+    quarantine_path = validation.write_quarantine_report(quarantine_entries, output_dir)
+    print("Quarantine report saved to:", quarantine_path)
+
+    merged = merge(demo, gdp, pop, output_dir)
+    merged_file = os.path.join(output_dir, "merged_data.csv")
+    save_csv(merged.to_pandas(), merged_file, index=False)
+    print("Merged dataset saved to:", merged_file)
+
+    merged, X = feature_engineering(merged)
+    feature_matrix_path = os.path.join(output_dir, "X.npy")
+    save_npy(feature_matrix_path, X)
+    print("Feature matrix (normalized) saved to:", feature_matrix_path)
+
+    merged_output_file = os.path.join(output_dir, "merged_data_with_features.csv")
+    save_csv(merged.to_pandas(), merged_output_file, index=False)
+    print("Updated merged dataset with the new features saved to:", merged_output_file)
+
+    return merged, X
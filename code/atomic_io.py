@@ -0,0 +1,36 @@
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    A context manager that yields a temporary path next to the target, moved onto it once written.
+    Readers never see a half-written file, and a failed write leaves the previous file untouched.
+    :param path: the final path of the file
+    :return: the temporary path to write to (same extension, so np.save does not rename it)
+    """
+    directory, name = os.path.split(path)
+    root, ext = os.path.splitext(name)
+    # A unique hidden name in the same directory, so os.replace stays on the same filesystem
+    tmp_path = os.path.join(directory, f".{root}.{uuid.uuid4().hex}{ext}")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_csv(df, path, **kwargs):
+    with atomic_path(path) as tmp_path:
+        df.to_csv(tmp_path, **kwargs)
+
+
+def save_npy(path, array):
+    with atomic_path(path) as tmp_path:
+        np.save(tmp_path, array)
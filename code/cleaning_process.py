@@ -5,6 +5,10 @@ import numpy as np
 import pandas as pd
 import unicodedata
 
+import validation
+from atomic_io import save_csv
+
+
 def remove_special_chars(text):
     # Normalize the string to decompose combined characters
     normalized_text = unicodedata.normalize('NFKD', text)
@@ -22,34 +26,27 @@ def normalize_country(name):
     return name.title()
 
 
-def clean_demographics(df, printing=False):
-    cols_to_clean = ['LifeExpectancy Both', 'LifeExpectancy Female', 'LifeExpectancy Male',
-                     'UrbanPopulation Percentage', 'UrbanPopulation Absolute', 'Population Density']
-
-    for col in cols_to_clean:
-        # Convertir en numérique, les valeurs invalides deviennent NaN
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    # Getting rid of the rows that contain NaN
-    df = df.dropna(subset=cols_to_clean)
+def clean_demographics(df, printing=False, quarantine_entries=None, output_dir='../output',
+                       life_expectancy_bounds=validation.LIFE_EXPECTANCY_BOUNDS):
+    # Coerce the numeric columns and check the bounds (40-100 by default) in a single mask
+    mask, failures = validation.validate(df, validation.demographics_schema(life_expectancy_bounds))
+    if quarantine_entries is not None:
+        quarantine_entries.append(validation.quarantine(df, mask, failures, "Demographics"))
 
-    # Getting rid of the negative values and the ones out of bounds (40-100)
-    df = df[(df['LifeExpectancy Both'] >= 40) & (df['LifeExpectancy Both'] <= 100)]
-    df = df[(df['LifeExpectancy Female'] >= 40) & (df['LifeExpectancy Female'] <= 100)]
-    df = df[(df['LifeExpectancy Male'] >= 40) & (df['LifeExpectancy Male'] <= 100)]
+    # Getting rid of the invalid rows
+    df = df[mask]
 
     # Dealing with the name shit
-    df['Original_Country'] = df['Country']
-
-    df['Country'] = df['Country'].apply(normalize_country)
+    original_country = df['Country']
+    df['Country'] = original_country.apply(normalize_country)
 
     # Find the rows where the names have changed
-    mismatches = df[df['Country'] != df['Original_Country']][['Original_Country', 'Country']]
+    changed = df['Country'] != original_country
+    mismatches = pd.DataFrame({'Original_Country': original_country[changed], 'Country': df['Country'][changed]})
     print('Number of mismatches:', mismatches.shape[0])
     # Save into a csv
-    mismatches.to_csv('../output/name_mismatches.csv', index=False)
+    save_csv(mismatches, os.path.join(output_dir, 'name_mismatches.csv'), index=False)
 
-    df = df.drop(columns=['Original_Country'])
     # df.set_index('Country', inplace=True)
     df.set_index('Country')
     return df
@@ -66,75 +63,84 @@ def clean_df(value):
         return None
 
 
-def process_gdp_data(df_gdp, output_dir='output'):
+def process_gdp_data(df_gdp, output_dir='output', quarantine_entries=None, tukey_k=1.5):
     # Cleaning
     df_gdp['GDP_per_capita_PPP'] = df_gdp['GDP_per_capita_PPP'].apply(clean_df)
 
-    # b) Delete the lines with NaN
-    missing_gdp = df_gdp[df_gdp['GDP_per_capita_PPP'].isna()]
+    # b) Document the lines with NaN
+    missing = df_gdp['GDP_per_capita_PPP'].isna()
+    missing_gdp = df_gdp[missing]
     if not missing_gdp.empty:
-        missing_gdp.to_csv(f"{output_dir}/dropped_gdp.csv", index=False)
-    df_gdp = df_gdp.dropna(subset=['GDP_per_capita_PPP'])
+        save_csv(missing_gdp, f"{output_dir}/dropped_gdp.csv", index=False)
 
-    # c) Identify the outliers by tukey
-    Q1 = df_gdp['GDP_per_capita_PPP'].quantile(0.25)
-    Q3 = df_gdp['GDP_per_capita_PPP'].quantile(0.75)
+    # c) Identify the outliers by tukey (NaN are ignored by the quantiles)
+    gdp = df_gdp['GDP_per_capita_PPP']
+    Q1 = gdp.quantile(0.25)
+    Q3 = gdp.quantile(0.75)
     IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
+    lower_bound = Q1 - tukey_k * IQR
+    upper_bound = Q3 + tukey_k * IQR
 
-    outliers = df_gdp[(df_gdp['GDP_per_capita_PPP'] < lower_bound) | (df_gdp['GDP_per_capita_PPP'] > upper_bound)]
+    outliers = df_gdp[(gdp < lower_bound) | (gdp > upper_bound)]
     print(f"Number of GDP outliers detected : {len(outliers)}")
 
     df_gdp['Country'] = df_gdp['Country'].apply(normalize_country)
 
-    # d) Check the doubles in the country column
-    duplicates = df_gdp[df_gdp.duplicated(subset='Country', keep=False)]
+    # d) Check the missing values and the doubles in the country column in a single mask
+    mask, failures = validation.validate(df_gdp, validation.GDP_SCHEMA)
+    if quarantine_entries is not None:
+        quarantine_entries.append(validation.quarantine(df_gdp, mask, failures, "GDP"))
+
+    # Documente all the occurrences of the doubles, only the first one is kept
+    candidates = mask | failures['Country: duplicate']
+    duplicates = df_gdp[df_gdp['Country'].where(candidates).duplicated(keep=False) & candidates]
     if not duplicates.empty:
-        # Documente the doubles
-        duplicates.to_csv(f"{output_dir}/duplicates_gdp.csv", index=False)
-        # Only keep the first occurrence
-        df_gdp = df_gdp.drop_duplicates(subset='Country', keep='first')
-        # print(f"Doublons détectés et un seul enregistrement conservé par pays.")
+        save_csv(duplicates, f"{output_dir}/duplicates_gdp.csv", index=False)
     print('Number of duplicates:', duplicates.shape[0])
 
+    df_gdp = df_gdp[mask]
     df_gdp.set_index('Country')
 
     return df_gdp, outliers, missing_gdp, duplicates
 
 
-def process_population_data(df_pop, output_dir='../output'):
+def process_population_data(df_pop, output_dir='../output', quarantine_entries=None, tukey_k=1.5):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     # a) Clean and convert the data
     df_pop['Population'] = df_pop['Population'].apply(clean_df)
 
-    # b) delete the lines with missing population
-    missing_pop = df_pop[df_pop['Population'].isna()]
+    # b) Check the missing population and the doubles in a single mask
+    mask, failures = validation.validate(df_pop, validation.POPULATION_SCHEMA)
+    if quarantine_entries is not None:
+        quarantine_entries.append(validation.quarantine(df_pop, mask, failures, "Population"))
+
+    missing_pop = df_pop[failures['Population: missing']]
     print(f"number of deleted lines (Missing population) : {len(missing_pop)}")
-    df_pop = df_pop.dropna(subset=['Population'])
 
-    # c) Detection of outliers (and after transformation log10)
+    # c) Detection of outliers (and after transformation log10), missing populations stay NaN
     df_pop['Log_Population'] = df_pop['Population'].apply(lambda x: math.log10(x) if x > 0 else None)
 
     Q1 = df_pop['Log_Population'].quantile(0.25)
     Q3 = df_pop['Log_Population'].quantile(0.75)
     IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
+    lower_bound = Q1 - tukey_k * IQR
+    upper_bound = Q3 + tukey_k * IQR
 
     outliers = df_pop[(df_pop['Log_Population'] < lower_bound) | (df_pop['Log_Population'] > upper_bound)]
     print(f"number of outliers in the population (log10) : {len(outliers)}")
 
     # d) Double verification
-    duplicates = df_pop[df_pop.duplicated(subset='Country', keep=False)]
+    candidates = mask | failures['Country: duplicate']
+    duplicates = df_pop[df_pop['Country'].where(candidates).duplicated(keep=False) & candidates]
     if not duplicates.empty:
         print(f"{len(duplicates)} doublons detected.")
-        duplicates.to_csv(f"{output_dir}/duplicates_population.csv", index=False)
-        df_pop = df_pop.drop_duplicates(subset='Country', keep='first')
+        save_csv(duplicates, f"{output_dir}/duplicates_population.csv", index=False)
     print('Number of duplicates:', duplicates.shape[0])
 
+    df_pop = df_pop[mask]
+
     # Normalize country
     df_pop['Country'] = df_pop['Country'].apply(normalize_country)
 
@@ -143,4 +149,4 @@ def process_population_data(df_pop, output_dir='../output'):
     # Optionnel : supprimer la colonne temporaire log
     # df_pop = df_pop.drop(columns=['Log_Population'])
 
-    return df_pop, outliers, missing_pop, duplicates
\ No newline at end of file
+    return df_pop, outliers, missing_pop, duplicates
@@ -0,0 +1,248 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from atomic_io import save_csv
+from feature_engineering import FEATURES_TO_NORMALIZE
+
+# Rows processed at once, so the distance matrix stays small even with millions of rows
+CHUNK_SIZE = 65536
+
+
+def load_feature_matrix(path):
+    """
+    A function that opens the feature matrix without reading it into memory
+    :param path: the path of the .npy file
+    :return: the memory-mapped matrix
+    """
+    return np.load(path, mmap_mode="r")
+
+
+def _as_matrix(source):
+    # The workers receive the path of a .npy file and memory-map it, instead of a pickled copy of the matrix
+    return load_feature_matrix(source) if isinstance(source, (str, os.PathLike)) else source
+
+
+def squared_distances(X, centers):
+    """
+    A function that computes the squared euclidean distances between rows and centers
+    :param X: a (n, d) matrix
+    :param centers: a (k, d) matrix
+    :return: the (n, k) matrix of the squared distances
+    """
+    X = np.asarray(X, dtype=np.float64)
+    distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0, out=distances)
+
+
+def assign(X, centers, chunk_size=CHUNK_SIZE):
+    """
+    A function that assigns each row to its closest center
+    :param X: a (n, d) matrix, possibly memory-mapped
+    :param centers: a (k, d) matrix
+    :param chunk_size: the number of rows processed at once
+    :return: the labels and the inertia (sum of the squared distances to the closest center)
+    """
+    labels = np.empty(X.shape[0], dtype=np.int64)
+    inertia = 0.0
+    for start in range(0, X.shape[0], chunk_size):
+        distances = squared_distances(X[start:start + chunk_size], centers)
+        labels[start:start + chunk_size] = distances.argmin(axis=1)
+        inertia += distances.min(axis=1).sum()
+    return labels, inertia
+
+
+def kmeans_plus_plus(X, k, rng, sample_size=10000):
+    """
+    A function that chooses the initial centers with k-means++ on a sample of the rows
+    :param X: a (n, d) matrix
+    :param k: the number of clusters
+    :param rng: the numpy random generator
+    :param sample_size: the maximum number of rows used for the initialization
+    :return: the (k, d) matrix of the initial centers
+    """
+    n = X.shape[0]
+    if n > sample_size:
+        sample = np.asarray(X[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float64)
+    else:
+        sample = np.asarray(X, dtype=np.float64)
+
+    centers = np.empty((k, X.shape[1]))
+    centers[0] = sample[rng.integers(len(sample))]
+    closest = squared_distances(sample, centers[:1])[:, 0]
+    for i in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(sample), p=closest / total) if total > 0 else rng.integers(len(sample))
+        centers[i] = sample[index]
+        closest = np.minimum(closest, squared_distances(sample, centers[i:i + 1])[:, 0])
+    return centers
+
+
+def _lloyd(source, k, seed, max_iter, tol, chunk_size):
+    """
+    A single k-means run (Lloyd's algorithm), executed in a worker process
+    :return: the labels, the centers and the inertia
+    """
+    X = _as_matrix(source)
+    rng = np.random.default_rng(seed)
+    centers = kmeans_plus_plus(X, k, rng)
+    for _ in range(max_iter):
+        sums = np.zeros_like(centers)
+        counts = np.zeros(k)
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = np.asarray(X[start:start + chunk_size], dtype=np.float64)
+            labels = squared_distances(chunk, centers).argmin(axis=1)
+            counts += np.bincount(labels, minlength=k)
+            for j in range(X.shape[1]):
+                sums[:, j] += np.bincount(labels, weights=chunk[:, j], minlength=k)
+
+        # An empty cluster keeps its previous center
+        new_centers = centers.copy()
+        non_empty = counts > 0
+        new_centers[non_empty] = sums[non_empty] / counts[non_empty, None]
+        shift = ((new_centers - centers) ** 2).sum()
+        centers = new_centers
+        if shift <= tol:
+            break
+
+    labels, inertia = assign(X, centers, chunk_size)
+    return labels, centers, inertia
+
+
+def _minibatch(source, k, seed, max_iter, tol, chunk_size, batch_size=1024):
+    """
+    A single mini-batch k-means run, executed in a worker process
+    :return: the labels, the centers and the inertia
+    """
+    X = _as_matrix(source)
+    rng = np.random.default_rng(seed)
+    centers = kmeans_plus_plus(X, k, rng)
+    seen = np.zeros(k)
+    for _ in range(max_iter):
+        batch = np.asarray(X[np.sort(rng.choice(X.shape[0], min(batch_size, X.shape[0]), replace=False))],
+                           dtype=np.float64)
+        labels = squared_distances(batch, centers).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        for j in range(X.shape[1]):
+            sums[:, j] = np.bincount(labels, weights=batch[:, j], minlength=k)
+
+        # Each center moves towards the mean of its batch points with a per-center learning rate of 1 / seen
+        seen += counts
+        updated = counts > 0
+        step = (sums[updated] - counts[updated, None] * centers[updated]) / seen[updated, None]
+        centers[updated] += step
+        if (step ** 2).sum() <= tol:
+            break
+
+    labels, inertia = assign(X, centers, chunk_size)
+    return labels, centers, inertia
+
+
+def kmeans(X, k, n_init=8, max_iter=300, tol=1e-8, seed=0, method="kmeans", n_jobs=None,
+           chunk_size=CHUNK_SIZE, batch_size=1024):
+    """
+    A function that clusters the rows with k-means, the restarts run in parallel processes
+    :param X: the path of a .npy file (memory-mapped in each worker), or a (n, d) matrix (sent to each worker)
+    :param k: the number of clusters
+    :param n_init: the number of restarts, the run with the lowest inertia is kept
+    :param max_iter: the maximum number of iterations (of batches for the mini-batch variant)
+    :param tol: the convergence threshold on the squared shift of the centers
+    :param seed: the seed of the first restart, restart i uses seed + i
+    :param method: "kmeans" (Lloyd's algorithm) or "minibatch"
+    :param n_jobs: the number of worker processes (default: the number of cores), 1 runs in this process
+    :param chunk_size: the number of rows processed at once
+    :param batch_size: the batch size of the mini-batch variant
+    :return: the labels, the centers and the inertia of the best run
+    """
+    if method not in ("kmeans", "minibatch"):
+        raise ValueError(f"Unknown clustering method '{method}', expected 'kmeans' or 'minibatch'.")
+    n_rows = _as_matrix(X).shape[0]
+    if not 1 <= k <= n_rows:
+        raise ValueError(f"The number of clusters must be between 1 and {n_rows}, got {k}.")
+
+    run = _lloyd if method == "kmeans" else _minibatch
+    arguments = [(X, k, seed + i, max_iter, tol, chunk_size) for i in range(n_init)]
+    extra = {} if method == "kmeans" else {"batch_size": batch_size}
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, n_init)
+    if n_jobs == 1:
+        runs = [run(*args, **extra) for args in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(run, *args, **extra) for args in arguments]
+            runs = [future.result() for future in futures]
+
+    return min(runs, key=lambda result: result[2])
+
+
+def pca(X, n_components=2, chunk_size=CHUNK_SIZE):
+    """
+    A function that computes the principal components from the covariance matrix, accumulated chunk by chunk
+    :param X: a (n, d) matrix, possibly memory-mapped
+    :param n_components: the number of components kept
+    :param chunk_size: the number of rows processed at once
+    :return: the (n, n_components) projections, the components and the explained variance ratios
+    """
+    n, d = X.shape
+    total = np.zeros(d)
+    gram = np.zeros((d, d))
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(X[start:start + chunk_size], dtype=np.float64)
+        total += chunk.sum(axis=0)
+        gram += chunk.T @ chunk
+    mean = total / n
+    covariance = (gram - n * np.outer(mean, mean)) / (n - 1)
+
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvalues, eigenvectors = eigenvalues[order], eigenvectors[:, order]
+    # Fix the sign of each component so the results are reproducible
+    eigenvectors *= np.where(eigenvectors[np.abs(eigenvectors).argmax(axis=0), range(d)] < 0, -1, 1)
+    components = eigenvectors[:, :n_components].T
+
+    projections = np.empty((n, n_components))
+    for start in range(0, n, chunk_size):
+        projections[start:start + chunk_size] = (np.asarray(X[start:start + chunk_size]) - mean) @ components.T
+    return projections, components, eigenvalues[:n_components] / eigenvalues.sum()
+
+
+def clustering_stage(k=4, method="kmeans", n_init=8, n_jobs=None, output_dir="../output",
+                     feature_names=FEATURES_TO_NORMALIZE):
+    """
+    A function that clusters the normalized feature matrix and writes the assignments back to the merged dataset
+    :param k: the number of clusters
+    :param method: "kmeans" or "minibatch"
+    :param n_init: the number of restarts
+    :param n_jobs: the number of worker processes
+    :param output_dir: the output directory, with X.npy and merged_data_with_features.csv
+    :param feature_names: the names of the columns of X.npy, used for the cluster centers
+    :return: the merged dataset with the Cluster, PC1 and PC2 columns
+    """
+    matrix_file = os.path.join(output_dir, "X.npy")
+    X = load_feature_matrix(matrix_file)
+    df = pd.read_csv(os.path.join(output_dir, "merged_data_with_features.csv"), float_precision="round_trip")
+    if df.shape[0] != X.shape[0]:
+        raise ValueError(f"X.npy has {X.shape[0]} rows but the merged dataset has {df.shape[0]}.")
+    if len(feature_names) != X.shape[1]:
+        raise ValueError(f"X.npy has {X.shape[1]} columns but {len(feature_names)} feature names were given.")
+
+    labels, centers, inertia = kmeans(matrix_file, k, n_init=n_init, method=method, n_jobs=n_jobs)
+    print(f"{method} with k={k}: inertia {inertia:.4f}, cluster sizes {np.bincount(labels, minlength=k).tolist()}")
+
+    projections, _, explained = pca(X, n_components=2)
+    print("Explained variance ratio of the 2 principal components:", explained.round(4).tolist())
+
+    df["Cluster"] = labels
+    df["PC1"] = projections[:, 0]
+    df["PC2"] = projections[:, 1]
+    clusters_file = os.path.join(output_dir, "merged_data_with_clusters.csv")
+    save_csv(df, clusters_file, index=False)
+    print("Merged dataset with the cluster assignments saved to:", clusters_file)
+
+    centers_file = os.path.join(output_dir, "cluster_centers.csv")
+    save_csv(pd.DataFrame(centers, columns=list(feature_names)), centers_file, index_label="Cluster")
+    print("Cluster centers saved to:", centers_file)
+    return df
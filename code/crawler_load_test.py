@@ -0,0 +1,106 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import demographics_crawler
+from mock_worldometers import MockWorldometers
+
+FIELDS = ["LifeExpectancy Both", "LifeExpectancy Female", "LifeExpectancy Male",
+          "UrbanPopulation Percentage", "UrbanPopulation Absolute", "Population Density"]
+
+
+def extraction_accuracy(expected_file, scraped_file):
+    """
+    A function that compares the scraped values with the recorded ones
+    :param expected_file: the recorded demographics served by the mock server
+    :param scraped_file: the CSV written by demographics_crawler.retrieve_data
+    :return: the share of the (country, field) values extracted correctly
+    """
+    expected = pd.read_csv(expected_file).set_index("Country")[FIELDS]
+    scraped = pd.read_csv(scraped_file).set_index("Country").reindex(expected.index)[FIELDS]
+    scraped = scraped.apply(pd.to_numeric, errors="coerce")
+    # A value missing from the recorded page must also be missing from the scraped one
+    correct = np.isclose(scraped.values, expected.values.astype(float), equal_nan=True)
+    return correct.mean()
+
+
+def run_load_test(records_file, workers_list, output_dir="../output", **server_options):
+    """
+    A function that crawls the mock server once per concurrency setting
+    :param records_file: the recorded demographics served by the mock server
+    :param workers_list: the numbers of concurrent workers to test
+    :param output_dir: the output directory
+    :param server_options: the fault injection options of MockWorldometers
+    :return: a DataFrame with one line per concurrency setting
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    for workers in workers_list:
+        scraped_file = os.path.join(output_dir, f"load_test_demographics_{workers}.csv")
+        with MockWorldometers(records_file, **server_options) as server:
+            timings = []
+            start = time.perf_counter()
+            demographics_crawler.retrieve_data(scraped_file, base_url=server.base_url, max_workers=workers, delay=0,
+                                               timings=timings)
+            elapsed = time.perf_counter() - start
+            log = pd.DataFrame(server.log)
+            faults = server.expected_faults()
+
+        pages = log[log["path"] != "/demographics/"]
+        # Client side: download and parsing of each country page by the crawler
+        latencies_ms = np.array(timings) * 1000
+        # Server side: handling time of each country page, with the injected latency
+        server_latencies_ms = pages["latency"].values * 1000
+        results.append({
+            "workers": workers,
+            "requests": len(log),
+            "seconds": round(elapsed, 3),
+            "pages_per_second": round(len(pages) / elapsed, 2),
+            "latency_p50_ms": round(np.percentile(latencies_ms, 50), 2),
+            "latency_p90_ms": round(np.percentile(latencies_ms, 90), 2),
+            "latency_p99_ms": round(np.percentile(latencies_ms, 99), 2),
+            "server_p50_ms": round(np.percentile(server_latencies_ms, 50), 2),
+            "server_p90_ms": round(np.percentile(server_latencies_ms, 90), 2),
+            "server_p99_ms": round(np.percentile(server_latencies_ms, 99), 2),
+            "errors": int((pages["status"] >= 500).sum()),
+            "rate_limited": int((pages["status"] == 429).sum()),
+            "malformed": int((pages["fault"] == "malformed").sum()),
+            "accuracy": round(extraction_accuracy(records_file, scraped_file), 4),
+            # Share of the country pages served without an injected fault
+            "healthy_pages": round(1 - len(faults) / len(server.records), 4),
+        })
+        print(f"workers={workers}: {results[-1]['pages_per_second']} pages/s, accuracy {results[-1]['accuracy']}")
+
+    summary = pd.DataFrame(results)
+    summary_file = os.path.join(output_dir, "crawler_load_test.csv")
+    summary.to_csv(summary_file, index=False)
+    print("Load test summary saved to:", summary_file)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of demographics_crawler against a local mock server.")
+    parser.add_argument("--records", default="./demographics_data.csv", help="recorded demographics to serve")
+    parser.add_argument("--pages-dir", default=None, help="directory of recorded HTML pages (index.html, <slug>.html)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="concurrency settings to test")
+    parser.add_argument("--latency", type=float, default=0.02, help="injected latency per request, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of the pages answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of the pages answered with a 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of the pages truncated")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the injected faults")
+    parser.add_argument("--output-dir", default="../output")
+    args = parser.parse_args()
+
+    summary = run_load_test(args.records, args.workers, output_dir=args.output_dir, pages_dir=args.pages_dir,
+                            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate,
+                            seed=args.seed)
+    print(summary.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 import csv
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0"
@@ -11,12 +12,13 @@ HEADERS = {
 BASE_URL = "https://www.worldometers.info"
 DEMOGRAPHICS_URL = f"{BASE_URL}/demographics/"
 
-def get_country_links():
+def get_country_links(base_url=BASE_URL):
     """
     A function that gets the country links from the DEMOGRAPHICS website.
+    :param base_url: the root of the website (a local mock server can be used instead)
     :return: A list of the country links
     """
-    res = requests.get(DEMOGRAPHICS_URL)
+    res = requests.get(f"{base_url}/demographics/")
     soup = BeautifulSoup(res.content, "html.parser")
     links = []
 
@@ -26,7 +28,7 @@ def get_country_links():
         # Check if the link matches the format for country demographics pages
         if href.startswith("/demographics/") and href.endswith("-demographics/"):
             country_name = a_tag.text.strip()
-            full_url = BASE_URL + href
+            full_url = base_url + href
             links.append((country_name, full_url))
 
     return links
@@ -129,18 +131,36 @@ blacklist = {
     # Add other names if necessary
 }
 
-def retrieve_data(file_name):
+def retrieve_data(file_name, base_url=BASE_URL, max_workers=1, delay=0.005, timings=None):
     """
     A function that retrieves the data from the DEMOGRAPHICS website
     :param file_name: the name of the save file
+    :param base_url: the root of the website (a local mock server can be used instead)
+    :param max_workers: the number of country pages downloaded concurrently
+    :param delay: the pause after each country page, to avoid spamming the site
+    :param timings: an optional list, filled with the duration in seconds of each country page
+                    (download and parsing, as seen by the crawler)
     :return:
     """
-    countries = get_country_links()
+    countries = get_country_links(base_url)
     # Filter out blacklisted names
     countries = [(name, url) for name, url in countries if name not in blacklist]
     print(f"Total: {len(countries)} countries")
     print(f"{len(countries)} countries found. Starting scraping...")
 
+    def scrape(i, country, url):
+        print(f"[{i+1}/{len(countries)}] Scraping {country}...")
+        start = time.perf_counter()
+        try:
+            return extract_country_data(country, url)
+        except Exception as e:
+            print(f"Error scraping {country}: {e}")
+            return None
+        finally:
+            if timings is not None:
+                timings.append(time.perf_counter() - start)  # list.append is thread-safe
+            time.sleep(delay)  # Sleep to avoid spamming the site
+
     with open(file_name, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=[
             "Country", "LifeExpectancy Both", "LifeExpectancy Female", "LifeExpectancy Male",
@@ -148,13 +168,12 @@ def retrieve_data(file_name):
         ])
         writer.writeheader()
 
-        for i, (country, url) in enumerate(countries):
-            print(f"[{i+1}/{len(countries)}] Scraping {country}...")
-            try:
-                data = extract_country_data(country, url)
-                writer.writerow(data)
-            except Exception as e:
-                print(f"Error scraping {country}: {e}")
-            time.sleep(0.005)  # Sleep to avoid spamming the site
+        # The rows are written in the order of the links, whatever the number of workers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda args: scrape(*args),
+                                   [(i, country, url) for i, (country, url) in enumerate(countries)])
+            for data in results:
+                if data is not None:
+                    writer.writerow(data)
 
-    print("Scraping finished. CSV file saved.")
\ No newline at end of file
+    print("Scraping finished. CSV file saved.")
@@ -2,9 +2,13 @@ import os
 import numpy as np
 import pandas as pd
 
+from atomic_io import save_csv, save_npy
 
-def feature_engineering(df):
-    output_dir = "../output"
+# The columns normalized into the final feature matrix X.npy
+FEATURES_TO_NORMALIZE = ["LifeExpectancy Both", "LogGDPperCapita", "LogPopulation"]
+
+
+def feature_engineering(df, output_dir="../output", features_to_normalize=FEATURES_TO_NORMALIZE):
     # ---------------------- 5.1 New Feature: Total GDP ----------------------
     # Ensure the required columns exist
     required_cols = ["GDP_per_capita_PPP", "Population"]
@@ -33,9 +37,7 @@ def feature_engineering(df):
     df["LogPopulation"] = np.log10(df["Population"])
 
     # ---------------------- 5.3 Scaling (Z-score Normalization) ----------------------
-    # Define the three columns to normalize.
-    features_to_normalize = ["LifeExpectancy Both", "LogGDPperCapita", "LogPopulation"]
-    # Check that these columns exist.
+    # Check that the columns to normalize exist.
     for col in features_to_normalize:
         if col not in df.columns:
             raise KeyError(f"Column '{col}' not found in the merged dataset. Please verify your data.")
@@ -52,12 +54,12 @@ def feature_engineering(df):
 
     # Save the feature matrix as a numpy array in output/X.npy
     feature_matrix_path = os.path.join(output_dir, "X.npy")
-    np.save(feature_matrix_path, feature_matrix.values)
+    save_npy(feature_matrix_path, feature_matrix.values)
     print("Feature matrix (normalized) saved to:", feature_matrix_path)
 
     # Optionally, save the updated merged dataset (including the new features) for reference.
     merged_output_file = os.path.join(output_dir, "merged_data_with_features.csv")
-    df.to_csv(merged_output_file, index=False)
+    save_csv(df, merged_output_file, index=False)
     print("Updated merged dataset with the new features saved to:", merged_output_file)
 
 
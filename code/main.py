@@ -1,10 +1,14 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 import demographics_crawler
 import cleaning_process
 import feature_engineering
 import merge_datasets
+import validation
+import arrow_pipeline
+import clustering
 # import analysis_module
 
 
@@ -15,11 +19,14 @@ def print_row_counts(before_df, after_df, dataset_name):
     print("-" * 40)
 
 
-def data_acquisition(filename_demographics, filename_gdp, filename_pop, printing=False):
-    # Ensure the output directory exists
-    output_dir = "../output"
-    os.makedirs(output_dir, exist_ok=True)
-
+def load_datasets(filename_demographics, filename_gdp, filename_pop):
+    """
+    A function that loads the three datasets and casts their numeric columns, before any cleaning
+    :param filename_demographics: the demographics CSV file
+    :param filename_gdp: the GDP CSV file
+    :param filename_pop: the population CSV file
+    :return: the demographics, GDP and population DataFrames
+    """
     # -------------------- DEMOGRAPHICS --------------------
     # Load the extracted demographics data into a DataFrame
     df_demographics = pd.read_csv(filename_demographics)
@@ -41,6 +48,32 @@ def data_acquisition(filename_demographics, filename_gdp, filename_pop, printing
             df_demographics[col] = df_demographics[col].replace({',': ''}, regex=True)
             df_demographics[col] = pd.to_numeric(df_demographics[col], errors='coerce')
 
+    # -------------------- GDP & POPULATION --------------------
+    # Read the GDP and Population CSV files into DataFrames with "None" interpreted as a missing value.
+    df_gdp = pd.read_csv(filename_gdp, na_values="None")
+    df_pop = pd.read_csv(filename_pop, na_values="None")
+
+    # (c) Ensure numeric types for the GDP and Population columns.
+    if "GDP_per_capita_PPP" in df_gdp.columns:
+        df_gdp["GDP_per_capita_PPP"] = pd.to_numeric(df_gdp["GDP_per_capita_PPP"], errors="coerce")
+    if "Population" in df_pop.columns:
+        df_pop["Population"] = pd.to_numeric(df_pop["Population"], errors="coerce")
+
+    return df_demographics, df_gdp, df_pop
+
+
+def save_acquisition_files(df_demographics, df_gdp, df_pop, output_dir="../output", printing=False):
+    """
+    A function that saves the loaded datasets, their first rows before and after sorting and their statistics
+    :param df_demographics: the demographics DataFrame returned by load_datasets
+    :param df_gdp: the GDP DataFrame returned by load_datasets
+    :param df_pop: the population DataFrame returned by load_datasets
+    :param output_dir: the output directory
+    :param printing: print the tables
+    """
+    # Ensure the output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
     # Save the cleaned demographics DataFrame to output/demographics_data.csv
     demographics_data_path = os.path.join(output_dir, "demographics_data.csv")
     df_demographics.to_csv(demographics_data_path, index=False)
@@ -76,26 +109,17 @@ def data_acquisition(filename_demographics, filename_gdp, filename_pop, printing
         print(f"\nFirst 10 rows after sort saved to {after_sort_path}\n")
 
     # -------------------- GDP & POPULATION --------------------
-    # Read the GDP and Population CSV files into DataFrames with "None" interpreted as a missing value.
-    df_gdp = pd.read_csv(filename_gdp, na_values="None")
-    df_pop = pd.read_csv(filename_pop, na_values="None")
-
     if printing:
         print("GDP DataFrame (unsorted):")
         print(df_gdp.head())
         print("\nPopulation DataFrame (unsorted):")
         print(df_pop.head())
 
-    # (c) Ensure numeric types for the GDP and Population columns.
-    if "GDP_per_capita_PPP" in df_gdp.columns:
-        df_gdp["GDP_per_capita_PPP"] = pd.to_numeric(df_gdp["GDP_per_capita_PPP"], errors="coerce")
-    else:
+    if "GDP_per_capita_PPP" not in df_gdp.columns:
         if printing:
             print("Warning: 'GDP_per_capita_PPP' column not found in df_gdp.")
 
-    if "Population" in df_pop.columns:
-        df_pop["Population"] = pd.to_numeric(df_pop["Population"], errors="coerce")
-    else:
+    if "Population" not in df_pop.columns:
         if printing:
             print("Warning: 'Population' column not found in df_pop.")
 
@@ -165,11 +189,15 @@ def data_acquisition(filename_demographics, filename_gdp, filename_pop, printing
         print(pop_describe)
         print(f"Saved to {pop_describe_path}")
 
+
+def data_acquisition(filename_demographics, filename_gdp, filename_pop, printing=False):
+    df_demographics, df_gdp, df_pop = load_datasets(filename_demographics, filename_gdp, filename_pop)
+    save_acquisition_files(df_demographics, df_gdp, df_pop, printing=printing)
     return df_demographics, df_gdp, df_pop
 
 
 
-def main():
+def main(engine="pandas"):
     file_name_demo = "./demographics_data.csv"
     gdp_file = "./gdp_per_capita_2021.csv"
     pop_file = "./population_2021.csv"
@@ -182,6 +210,17 @@ def main():
     else:
         print("File already exists. Skipping the crawling.")
 
+    # Columnar mode: cleaning, merging and feature engineering on Arrow/NumPy buffers
+    if engine == "arrow":
+        raw_tables = []
+        arrow_pipeline.run_pipeline(file_name_demo, gdp_file, pop_file, raw_tables=raw_tables)
+        # Same acquisition files as the pandas path, from the tables already read
+        save_acquisition_files(*(table.to_pandas() for table in raw_tables))
+        print("Clustering:")
+        clustering.clustering_stage()
+        print("Done.")
+        return
+
     df_demographics, df_gdp, df_pop =  data_acquisition(file_name_demo, gdp_file, pop_file, printing=True)
 
     # ----------------------- Print DataFrame Information -----------------------
@@ -233,9 +272,14 @@ def main():
             " were not found in the demographics dataset.")
 
     print("Beginning Cleaning:")
-    df_demographics_cleaned = cleaning_process.clean_demographics(df_demographics)
-    gdp_results = cleaning_process.process_gdp_data(df_gdp)
-    pop_results = cleaning_process.process_population_data(df_pop)
+    quarantine_entries = []
+    df_demographics_cleaned = cleaning_process.clean_demographics(df_demographics, quarantine_entries=quarantine_entries)
+    gdp_results = cleaning_process.process_gdp_data(df_gdp, quarantine_entries=quarantine_entries)
+    pop_results = cleaning_process.process_population_data(df_pop, quarantine_entries=quarantine_entries)
+
+    # Save the rejected rows of the three datasets and the reasons they failed
+    quarantine_path = validation.write_quarantine_report(quarantine_entries)
+    print("Quarantine report saved to:", quarantine_path)
 
     print_row_counts(df_demographics, df_demographics_cleaned, "Demographics")
     print_row_counts(df_gdp, gdp_results[0], "GDP")
@@ -249,10 +293,14 @@ def main():
     print("Performing Feature Engineering:")
     feature_engineering.feature_engineering(df_merged)
 
+    print("Clustering:")
+    clustering.clustering_stage()
+
     # analysis_module.generate_feature_engineering_summary(df_merged, df_demographics)
 
     print("Done.")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Usage: python main.py [pandas|arrow]
+    main(sys.argv[1] if len(sys.argv) > 1 else "pandas")
@@ -2,26 +2,31 @@ import os
 import numpy as np
 import pandas as pd
 
-
-def merge_datasets(df_demo, df_gdp, df_pop):
-    # Define a dictionary mapping alternate country names to their canonical form.
-    country_mapping = {
-        "Cape Verde": "Cabo Verde",
-        "Côte d'Ivoire": "Cote d'Ivoire",
-        "Dr Congo": "Democratic Republic Of Congo",
-        "Faeroe Islands": "Faroe Islands",
-        "Micronesia (Country)": "Micronesia",
-        "Réunion": "Reunion",
-        "Sao Tome & Principe": "Sao Tome And Principe",
-        "Palestine": "State Of Palestine",
-        "U.S. Virgin Islands": "United States Virgin Islands",
-        # Add other mappings here as necessary.
-    }
-
+from atomic_io import save_csv, save_npy
+
+# Define a dictionary mapping alternate country names to their canonical form.
+COUNTRY_MAPPING = {
+    "Cape Verde": "Cabo Verde",
+    "Côte d'Ivoire": "Cote d'Ivoire",
+    "Dr Congo": "Democratic Republic Of Congo",
+    "Faeroe Islands": "Faroe Islands",
+    "Micronesia (Country)": "Micronesia",
+    "Réunion": "Reunion",
+    "Sao Tome & Principe": "Sao Tome And Principe",
+    "Palestine": "State Of Palestine",
+    "U.S. Virgin Islands": "United States Virgin Islands",
+    # Add other mappings here as necessary.
+}
+
+# The features of the matrix saved by merge_datasets (adjust as needed).
+SELECTED_FEATURES = ["LifeExpectancy Both", "Log_Population"]
+
+
+def merge_datasets(df_demo, df_gdp, df_pop, selected_features=SELECTED_FEATURES, output_dir="../output"):
     # Function to apply the mapping after stripping whitespace.
     def clean_country(name):
         name = name.strip()
-        return country_mapping.get(name, name)
+        return COUNTRY_MAPPING.get(name, name)
 
     # Ensure that all DataFrames have a "Country" column.
     for df, name in zip([df_demo, df_gdp, df_pop], ["demographics", "GDP", "population"]):
@@ -54,10 +59,9 @@ def merge_datasets(df_demo, df_gdp, df_pop):
     # (d) Compute and save the list of countries lost during the join.
     merged_countries = set(df_merged.index)
     lost_countries = sorted(list(all_countries - merged_countries))
-    output_dir = "../output"
     os.makedirs(output_dir, exist_ok=True)
     lost_countries_file = os.path.join(output_dir, "lost_countries.csv")
-    pd.DataFrame({"Country": lost_countries}).to_csv(lost_countries_file, index=False)
+    save_csv(pd.DataFrame({"Country": lost_countries}), lost_countries_file, index=False)
     print("Lost countries saved to:", lost_countries_file)
 
     # (Optional) Reset the index if you prefer Country to be a regular column.
@@ -78,8 +82,6 @@ def merge_datasets(df_demo, df_gdp, df_pop):
     df_merged.dropna(subset=categorical_cols, inplace=True)
 
     # (f) Build the final feature matrix.
-    # Define the selected features (adjust as needed).
-    selected_features = ["LifeExpectancy Both", "Log_Population"]
     for col in selected_features:
         if col not in df_merged.columns:
             raise KeyError(f"Column '{col}' not found in the merged dataset.")
@@ -90,12 +92,12 @@ def merge_datasets(df_demo, df_gdp, df_pop):
     # Create the NumPy array for the selected features.
     X = df_merged[selected_features].values
     X_path = os.path.join(output_dir, "X.npy")
-    np.save(X_path, X)
+    save_npy(X_path, X)
     print("Final feature matrix saved to:", X_path)
 
     # Also save the merged dataset for later use.
     merged_file = os.path.join(output_dir, "merged_data.csv")
-    df_merged.to_csv(merged_file, index=False)
+    save_csv(df_merged, merged_file, index=False)
     print("Merged dataset saved to:", merged_file)
 
     return df_merged
@@ -0,0 +1,223 @@
+import csv
+import hashlib
+import html
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fault kinds that can be injected into the country pages
+FAULTS = ("error", "rate_limit", "malformed")
+
+INDEX_TEMPLATE = """<html><head><title>Demographics</title></head><body>
+<h1>Demographics of Countries</h1>
+<ul>
+{links}
+</ul>
+</body></html>"""
+
+COUNTRY_TEMPLATE = """<html><head><title>{name} Demographics</title></head><body>
+<h1>{name} Demographics</h1>
+<h2>Life Expectancy</h2>
+<div class="life-expectancy">
+<div><div>{both}</div><div>both sexes combined</div></div>
+<div><div>{female}</div><div>females</div></div>
+<div><div>{male}</div><div>males</div></div>
+</div>
+<h2>Urban Population</h2>
+<p>{percentage}% of the population of {name} is urban ({absolute} people in 2023)</p>
+<h2>Population Density</h2>
+<p>The 2023 population density in {name} is {density} people per Km2 (calculated on the land area).</p>
+</body></html>"""
+
+
+def slugify(name):
+    """
+    A function that builds the URL slug of a country page
+    :param name: the country name
+    :return: the slug (e.g. "Cabo Verde" -> "cabo-verde")
+    """
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def format_number(value):
+    # Whole numbers are written with thousands separators, like on the live site.
+    # A value the crawler did not find is recorded empty, and rendered empty.
+    if value in ("", None):
+        return ""
+    return f"{int(value):,}" if float(value).is_integer() and "." not in str(value) else str(value)
+
+
+def load_records(file_name):
+    """
+    A function that loads the recorded demographics, used as the content of the country pages
+    :param file_name: a CSV file with the columns written by demographics_crawler.retrieve_data
+    :return: a dict mapping each slug to its record
+    """
+    with open(file_name, newline="", encoding="utf-8") as f:
+        return {slugify(row["Country"]): row for row in csv.DictReader(f)}
+
+
+def render_index(records, extra_links=("World",)):
+    names = [record["Country"] for record in records.values()] + list(extra_links)
+    links = "\n".join(f'<li><a href="/demographics/{slugify(name)}-demographics/">{html.escape(name)}</a></li>'
+                      for name in names)
+    return INDEX_TEMPLATE.format(links=links)
+
+
+def render_country(record):
+    return COUNTRY_TEMPLATE.format(
+        name=html.escape(record["Country"]),
+        both=record["LifeExpectancy Both"],
+        female=record["LifeExpectancy Female"],
+        male=record["LifeExpectancy Male"],
+        percentage=record["UrbanPopulation Percentage"],
+        absolute=format_number(record["UrbanPopulation Absolute"]),
+        density=format_number(record["Population Density"]),
+    )
+
+
+class MockWorldometers:
+    """
+    A local stand-in for the worldometers demographics pages.
+    The pages are rendered from recorded data, or read from a directory of recorded HTML files
+    (index.html and <slug>.html). Faults are drawn from a hash of the seed and the path,
+    so the same pages fail on every run.
+    """
+
+    def __init__(self, records_file, pages_dir=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, malformed_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        self.records = load_records(records_file)
+        self.pages_dir = pages_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.rates = {"error": error_rate, "rate_limit": rate_limit_rate, "malformed": malformed_rate}
+        self.seed = seed
+        self.log = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self, path, salt):
+        # A deterministic number in [0, 1) for this path
+        digest = hashlib.sha256(f"{self.seed}:{salt}:{path}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+    def fault_for(self, path):
+        """
+        A function that decides which fault (if any) is injected on a page
+        :param path: the requested path
+        :return: one of FAULTS, or None
+        """
+        if path == "/demographics/":
+            return None
+        draw = self._draw(path, "fault")
+        threshold = 0.0
+        for fault in FAULTS:
+            threshold += self.rates[fault]
+            if draw < threshold:
+                return fault
+        return None
+
+    def expected_faults(self):
+        """
+        :return: a dict mapping the slug of each faulty page to its fault
+        """
+        faults = {}
+        for slug in self.records:
+            fault = self.fault_for(f"/demographics/{slug}-demographics/")
+            if fault:
+                faults[slug] = fault
+        return faults
+
+    def _page(self, path):
+        if path == "/demographics/":
+            name, render = "index", lambda: render_index(self.records)
+        else:
+            match = re.fullmatch(r"/demographics/(.+)-demographics/", path)
+            if not match or match.group(1) not in self.records:
+                return None
+            record = self.records[match.group(1)]
+            name, render = match.group(1), lambda: render_country(record)
+        if self.pages_dir:
+            recorded = os.path.join(self.pages_dir, f"{name}.html")
+            if os.path.exists(recorded):
+                with open(recorded, encoding="utf-8") as f:
+                    return f.read()
+        return render()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                start = time.perf_counter()
+                path = self.path.split("?")[0]
+                delay = mock.latency + mock.jitter * mock._draw(path, "latency")
+                if delay:
+                    time.sleep(delay)
+
+                fault = mock.fault_for(path)
+                page = mock._page(path)
+                if page is None:
+                    status, body = 404, "<html><body>Not Found</body></html>"
+                elif fault == "error":
+                    status, body = 500, "<html><body>Internal Server Error</body></html>"
+                elif fault == "rate_limit":
+                    status, body = 429, "<html><body>Too Many Requests</body></html>"
+                elif fault == "malformed":
+                    # Truncated in the middle of the markup, the closing tags are lost
+                    status, body = 200, page[:len(page) // 3] + "<div><p"
+                else:
+                    status, body = 200, page
+
+                data = body.encode("utf-8")
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+                with mock._lock:
+                    mock.log.append({"path": path, "status": status, "fault": fault,
+                                     "latency": time.perf_counter() - start})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Serve the recorded demographics until interrupted
+    with MockWorldometers("./demographics_data.csv", port=8000) as server:
+        print("Mock worldometers served at", server.base_url + "/demographics/")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
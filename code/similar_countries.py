@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import heapq
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from atomic_io import atomic_path
+
+# Maximum number of points in a leaf, scanned with a single vectorized distance computation
+LEAF_SIZE = 16
+INDEX_FILE = "similar_countries_index.npz"
+# Up to this number of rows, a batch of queries is answered by a vectorized scan of all the rows,
+# faster than walking the tree in Python one query at a time. Measured with 3 features and 1820 queries:
+# the scan is ~15x faster at 182 rows, both take the same time around 10,000 rows,
+# and the tree is ~6x faster at 100,000 rows.
+BRUTE_FORCE_ROWS = 10000
+# Number of (query, row, feature) differences computed at once by the scan
+SCAN_BLOCK = 1 << 22
+
+
+def file_checksum(path):
+    """
+    A function that hashes a file, used to detect a change of the feature matrix
+    :param path: the path of the file
+    :return: the sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KDTree:
+    """
+    A KD-tree stored in flat arrays (one entry per node), so it can be saved with np.savez.
+    Each node keeps the bounding box of its points, used to prune the search.
+    The points of a node are points[start:end] (the points are reordered during the build).
+    """
+
+    def __init__(self, points, order, start, end, left, right, lower, upper):
+        self.points = points
+        self.order = order
+        self.start = start
+        self.end = end
+        self.left = left
+        self.right = right
+        self.lower = lower
+        self.upper = upper
+
+    @classmethod
+    def build(cls, X, leaf_size=LEAF_SIZE):
+        """
+        A function that builds the tree by splitting each node at the median of its widest dimension
+        :param X: a (n, d) matrix
+        :param leaf_size: the maximum number of points in a leaf
+        :return: the KDTree
+        """
+        X = np.asarray(X, dtype=np.float64)
+        order = np.arange(X.shape[0])
+        start, end, left, right, lower, upper = [], [], [], [], [], []
+
+        def add_node(lo, hi):
+            start.append(lo)
+            end.append(hi)
+            left.append(-1)
+            right.append(-1)
+            box = X[order[lo:hi]]
+            lower.append(box.min(axis=0))
+            upper.append(box.max(axis=0))
+            return len(start) - 1
+
+        stack = [add_node(0, X.shape[0])]
+        while stack:
+            node = stack.pop()
+            lo, hi = start[node], end[node]
+            if hi - lo <= leaf_size:
+                continue
+            dim = int(np.argmax(upper[node] - lower[node]))
+            mid = (lo + hi) // 2
+            segment = order[lo:hi]
+            order[lo:hi] = segment[np.argpartition(X[segment, dim], mid - lo)]
+            left[node] = add_node(lo, mid)
+            right[node] = add_node(mid, hi)
+            stack.extend([left[node], right[node]])
+
+        return cls(X[order], order, np.array(start), np.array(end), np.array(left), np.array(right),
+                   np.array(lower), np.array(upper))
+
+    def _box_distance(self, node, q):
+        # Squared distance from q to the bounding box of the node
+        gap = np.maximum(self.lower[node] - q, 0) + np.maximum(q - self.upper[node], 0)
+        return float(gap @ gap)
+
+    def query(self, q, k):
+        """
+        A function that finds the k nearest points (best-first search)
+        :param q: the query point
+        :param k: the number of neighbours
+        :return: the row indices in X and the distances, closest first
+        """
+        best = []  # max-heap of (-squared distance, row)
+        candidates = [(0.0, 0)]
+        while candidates:
+            bound, node = heapq.heappop(candidates)
+            if len(best) == k and bound > -best[0][0]:
+                break
+            if self.left[node] == -1:
+                lo, hi = self.start[node], self.end[node]
+                diff = self.points[lo:hi] - q
+                for distance, row in zip(np.einsum("ij,ij->i", diff, diff), self.order[lo:hi]):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, row))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, row))
+            else:
+                for child in (self.left[node], self.right[node]):
+                    heapq.heappush(candidates, (self._box_distance(child, q), child))
+        best.sort(key=lambda item: -item[0])
+        return np.array([row for _, row in best], dtype=np.int64), np.sqrt([-d for d, _ in best])
+
+    def query_radius(self, q, r):
+        """
+        A function that finds all the points within a distance of q
+        :param q: the query point
+        :param r: the radius
+        :return: the row indices in X and the distances, closest first
+        """
+        rows, distances = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance(node, q) > r * r:
+                continue
+            if self.left[node] == -1:
+                lo, hi = self.start[node], self.end[node]
+                diff = self.points[lo:hi] - q
+                squared = np.einsum("ij,ij->i", diff, diff)
+                inside = squared <= r * r
+                rows.append(self.order[lo:hi][inside])
+                distances.append(np.sqrt(squared[inside]))
+            else:
+                stack.extend([self.left[node], self.right[node]])
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        distances = np.concatenate(distances) if distances else np.empty(0)
+        by_distance = np.argsort(distances, kind="stable")
+        return rows[by_distance], distances[by_distance]
+
+    def arrays(self):
+        return {"points": self.points, "order": self.order, "start": self.start, "end": self.end,
+                "left": self.left, "right": self.right, "lower": self.lower, "upper": self.upper}
+
+
+class SimilarCountriesIndex:
+    """
+    A persistent nearest-neighbour index over the feature_engineering output, keyed by country name.
+    The index file stores the checksum of X.npy and is rebuilt only when the matrix changes.
+    """
+
+    def __init__(self, tree, countries):
+        self.tree = tree
+        self.countries = countries
+        self.rows = {country: row for row, country in enumerate(countries)}
+        # Position of each row of X among the reordered points of the tree
+        self.positions = np.empty_like(tree.order)
+        self.positions[tree.order] = np.arange(len(tree.order))
+        # The matrix in the order of X, scanned instead of the tree for small indexes
+        self.matrix = tree.points[self.positions]
+
+    @classmethod
+    def load_or_build(cls, output_dir="../output"):
+        """
+        A function that loads the saved index, or builds it when X.npy has changed or the index file is unreadable
+        :param output_dir: the output directory, with X.npy and merged_data_with_features.csv
+        :return: the SimilarCountriesIndex
+        """
+        matrix_file = os.path.join(output_dir, "X.npy")
+        index_file = os.path.join(output_dir, INDEX_FILE)
+        checksum = file_checksum(matrix_file)
+
+        if os.path.exists(index_file):
+            try:
+                with np.load(index_file) as saved:
+                    if str(saved["checksum"]) == checksum:
+                        arrays = {name: saved[name] for name in saved.files if name not in ("checksum", "countries")}
+                        return cls(KDTree(**arrays), saved["countries"].tolist())
+            except (OSError, EOFError, ValueError, KeyError, TypeError, zipfile.BadZipFile) as e:
+                # A truncated or corrupted file is treated like a stale one
+                print(f"Unreadable similar countries index ({e!r}), rebuilding it.")
+
+        X = np.load(matrix_file, mmap_mode="r")
+        countries = pd.read_csv(os.path.join(output_dir, "merged_data_with_features.csv"))["Country"].tolist()
+        if len(countries) != X.shape[0]:
+            raise ValueError(f"X.npy has {X.shape[0]} rows but the merged dataset has {len(countries)} countries.")
+        tree = KDTree.build(X)
+        with atomic_path(index_file) as tmp_path:
+            np.savez(tmp_path, checksum=checksum, countries=np.array(countries), **tree.arrays())
+        print("Similar countries index built and saved to:", index_file)
+        return cls(tree, countries)
+
+    def _row(self, country):
+        if country not in self.rows:
+            raise KeyError(f"Country '{country}' not found in the index.")
+        return self.rows[country]
+
+    def _scan(self, rows):
+        """
+        A function that computes the squared distances from the query rows to every row, by blocks of queries
+        :param rows: the numpy array of the query rows
+        :return: a generator of the (queries in the block, n) matrices of the squared distances,
+                 the distance of each query to itself is set to infinity
+        """
+        step = max(1, SCAN_BLOCK // self.matrix.size)
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            diff = self.matrix[None, :, :] - self.matrix[block][:, None, :]
+            squared = np.einsum("qnd,qnd->qn", diff, diff)
+            squared[np.arange(len(block)), block] = np.inf
+            yield squared
+
+    def nearest(self, countries, k=5):
+        """
+        A function that finds the k most similar countries of each country
+        :param countries: a list of country names
+        :param k: the number of neighbours (the country itself is excluded)
+        :return: a dict mapping each country to a list of (neighbour, distance), closest first
+        """
+        rows = np.array([self._row(country) for country in countries], dtype=np.int64)
+        results = {}
+        if len(self.countries) <= BRUTE_FORCE_ROWS:
+            k = min(k, len(self.countries) - 1)
+            names = iter(countries)
+            for squared in self._scan(rows):
+                # The k smallest distances of each query, then sorted
+                closest = np.argpartition(squared, k, axis=1)[:, :k]
+                by_distance = np.argsort(np.take_along_axis(squared, closest, axis=1), axis=1, kind="stable")
+                closest = np.take_along_axis(closest, by_distance, axis=1)
+                distances = np.sqrt(np.take_along_axis(squared, closest, axis=1))
+                for neighbours, neighbour_distances in zip(closest, distances):
+                    results[next(names)] = [(self.countries[r], float(d))
+                                            for r, d in zip(neighbours, neighbour_distances)]
+            return results
+
+        for country in countries:
+            row = self._row(country)
+            rows, distances = self.tree.query(self.tree.points[self.positions[row]], k + 1)
+            results[country] = [(self.countries[r], float(d)) for r, d in zip(rows, distances) if r != row][:k]
+        return results
+
+    def within(self, countries, radius):
+        """
+        A function that finds the countries within a distance of each country
+        :param countries: a list of country names
+        :param radius: the maximum distance in the normalized feature space
+        :return: a dict mapping each country to a list of (neighbour, distance), closest first
+        """
+        rows = np.array([self._row(country) for country in countries], dtype=np.int64)
+        results = {}
+        if len(self.countries) <= BRUTE_FORCE_ROWS:
+            names = iter(countries)
+            for squared in self._scan(rows):
+                for query_squared in squared:
+                    inside = np.flatnonzero(query_squared <= radius * radius)
+                    inside = inside[np.argsort(query_squared[inside], kind="stable")]
+                    results[next(names)] = [(self.countries[r], float(d))
+                                            for r, d in zip(inside, np.sqrt(query_squared[inside]))]
+            return results
+
+        for country in countries:
+            row = self._row(country)
+            rows, distances = self.tree.query_radius(self.tree.points[self.positions[row]], radius)
+            results[country] = [(self.countries[r], float(d)) for r, d in zip(rows, distances) if r != row]
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Countries most similar to the given ones in the feature space.")
+    parser.add_argument("countries", nargs="+", help="country names, as in merged_data_with_features.csv")
+    parser.add_argument("--k", type=int, default=5, help="number of neighbours")
+    parser.add_argument("--radius", type=float, default=None, help="return all the countries within this distance")
+    parser.add_argument("--output-dir", default="../output")
+    args = parser.parse_args()
+
+    index = SimilarCountriesIndex.load_or_build(args.output_dir)
+    if args.radius is not None:
+        results = index.within(args.countries, args.radius)
+    else:
+        results = index.nearest(args.countries, args.k)
+    for country, neighbours in results.items():
+        print(f"{country}:")
+        for neighbour, distance in neighbours:
+            print(f"  {neighbour:<35} {distance:.4f}")
+
+
+if __name__ == "__main__":
+    main()
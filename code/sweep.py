@@ -0,0 +1,176 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cleaning_process
+import feature_engineering
+import merge_datasets
+import validation
+from atomic_io import atomic_path, save_csv
+from main import load_datasets
+
+INPUT_FILES = {
+    "demographics": "./demographics_data.csv",
+    "gdp": "./gdp_per_capita_2021.csv",
+    "population": "./population_2021.csv",
+}
+
+SWEEPS_DIR = "../output/sweeps"
+
+# The parameters of a pipeline variant and their default values
+DEFAULT_PARAMS = {
+    "tukey_k": 1.5,
+    "life_expectancy_bounds": validation.LIFE_EXPECTANCY_BOUNDS,
+    "features_to_normalize": feature_engineering.FEATURES_TO_NORMALIZE,
+}
+
+
+def expand_grid(grid):
+    """
+    A function that expands a parameter grid into the list of its combinations
+    :param grid: a dict mapping parameter names (keys of DEFAULT_PARAMS) to lists of values
+    :return: a list of dicts, one per variant, with the default value of the parameters not in the grid
+    """
+    unknown = set(grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise KeyError(f"Unknown sweep parameters: {sorted(unknown)}. Expected some of {sorted(DEFAULT_PARAMS)}.")
+    names = list(grid)
+    return [{**DEFAULT_PARAMS, **dict(zip(names, values))} for values in itertools.product(*grid.values())]
+
+
+def run_variant(params, run_dir, input_files=INPUT_FILES):
+    """
+    A function that runs the cleaning, merging and feature engineering of one variant in its own directory.
+    The messages of the pipeline go to run_dir/log.txt.
+    :param params: the parameters of the variant (see DEFAULT_PARAMS)
+    :param run_dir: the isolated output directory of the run, it must not exist yet
+    :param input_files: the paths of the demographics, GDP and population CSV files
+    :return: a dict summarizing the run
+    """
+    # os.mkdir fails if the directory exists, so two runs never share a directory
+    os.mkdir(run_dir)
+    with atomic_path(os.path.join(run_dir, "params.json")) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(params, f, indent=2)
+
+    summary = {"run": os.path.basename(run_dir), **{name: str(value) for name, value in params.items()}}
+    start = time.perf_counter()
+    with open(os.path.join(run_dir, "log.txt"), "w") as log, contextlib.redirect_stdout(log):
+        try:
+            # Same loading and numeric casts as main.py, so the default variant is the production pipeline
+            df_demographics, df_gdp, df_pop = load_datasets(
+                input_files["demographics"], input_files["gdp"], input_files["population"])
+
+            quarantine_entries = []
+            df_demographics_cleaned = cleaning_process.clean_demographics(
+                df_demographics, quarantine_entries=quarantine_entries, output_dir=run_dir,
+                life_expectancy_bounds=params["life_expectancy_bounds"])
+            gdp_results = cleaning_process.process_gdp_data(
+                df_gdp, output_dir=run_dir, quarantine_entries=quarantine_entries, tukey_k=params["tukey_k"])
+            pop_results = cleaning_process.process_population_data(
+                df_pop, output_dir=run_dir, quarantine_entries=quarantine_entries, tukey_k=params["tukey_k"])
+            validation.write_quarantine_report(quarantine_entries, output_dir=run_dir)
+
+            df_merged = merge_datasets.merge_datasets(
+                df_demographics_cleaned, gdp_results[0], pop_results[0], output_dir=run_dir)
+            feature_engineering.feature_engineering(
+                df_merged, output_dir=run_dir, features_to_normalize=params["features_to_normalize"])
+
+            # Mean absolute correlation between the normalized features of the final matrix
+            X = np.load(os.path.join(run_dir, "X.npy"))
+            correlations = np.corrcoef(X, rowvar=False).reshape(X.shape[1], X.shape[1])
+            off_diagonal = ~np.eye(X.shape[1], dtype=bool)
+            mean_abs_correlation = np.abs(correlations[off_diagonal]).mean() if X.shape[1] > 1 else 0.0
+
+            summary.update({
+                "status": "ok",
+                "demographics_rows": df_demographics_cleaned.shape[0],
+                "gdp_outliers": len(gdp_results[1]),
+                "population_outliers": len(pop_results[1]),
+                "quarantined_rows": sum(len(entry) for entry in quarantine_entries),
+                "countries": df_merged.shape[0],
+                "mean_life_expectancy": df_merged["LifeExpectancy Both"].mean(),
+                "mean_log_gdp_per_capita": df_merged["LogGDPperCapita"].mean(),
+                "features": X.shape[1],
+                "mean_abs_feature_correlation": mean_abs_correlation,
+            })
+        except Exception as e:
+            print(f"Run failed: {e!r}")
+            summary.update({"status": f"failed: {e!r}"})
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def create_sweep_dir(sweep_dir=None):
+    """
+    A function that creates the directory of a new sweep
+    :param sweep_dir: the directory to use, it must not exist or be empty.
+                      By default a new directory named after the start time is created in SWEEPS_DIR.
+    :return: the path of the sweep directory
+    """
+    if sweep_dir is None:
+        os.makedirs(SWEEPS_DIR, exist_ok=True)
+        return tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=SWEEPS_DIR)
+    os.makedirs(sweep_dir, exist_ok=True)
+    if os.listdir(sweep_dir):
+        raise FileExistsError(f"The sweep directory '{sweep_dir}' is not empty, use a new one.")
+    return sweep_dir
+
+
+def run_sweep(grid, sweep_dir=None, max_workers=None):
+    """
+    A function that runs every variant of a parameter grid in parallel worker processes
+    :param grid: a dict mapping parameter names to lists of values
+    :param sweep_dir: the directory of the sweep (see create_sweep_dir), each run gets its own sub-directory
+    :param max_workers: the number of worker processes (default: the number of cores)
+    :return: the comparison table, one line per run
+    """
+    variants = expand_grid(grid)
+    sweep_dir = create_sweep_dir(sweep_dir)
+    run_dirs = [os.path.join(sweep_dir, f"run_{i:03d}") for i in range(len(variants))]
+    print(f"Running {len(variants)} variants in {sweep_dir}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_variant, variants, run_dirs))
+
+    summary = pd.DataFrame(results)
+    summary_file = os.path.join(sweep_dir, "summary.csv")
+    save_csv(summary, summary_file, index=False)
+    print("Sweep summary saved to:", summary_file)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep of the cleaning, merging and feature engineering.")
+    parser.add_argument("--tukey-k", type=float, nargs="+", default=[DEFAULT_PARAMS["tukey_k"]],
+                        help="Tukey multipliers of the IQR for the GDP and population outliers")
+    parser.add_argument("--life-expectancy-bounds", type=json.loads, nargs="+",
+                        default=[list(DEFAULT_PARAMS["life_expectancy_bounds"])],
+                        help='bounds of the life expectancies, e.g. "[40, 100]" "[50, 90]"')
+    parser.add_argument("--features-to-normalize", type=json.loads, nargs="+",
+                        default=[DEFAULT_PARAMS["features_to_normalize"]],
+                        help='features of the final matrix X.npy, e.g. \'["LifeExpectancy Both", "LogPopulation"]\'')
+    parser.add_argument("--sweep-dir", default=None,
+                        help=f"new or empty directory of the sweep (default: a new directory in {SWEEPS_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    grid = {
+        "tukey_k": args.tukey_k,
+        "life_expectancy_bounds": [tuple(bounds) for bounds in args.life_expectancy_bounds],
+        "features_to_normalize": args.features_to_normalize,
+    }
+    summary = run_sweep(grid, args.sweep_dir, args.workers)
+    print(summary.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import pandas as pd
+
+from atomic_io import save_csv
+
+
+# Declarative validation schemas, one per dataset.
+# Each column maps to its rules:
+#   type     - "numeric" coerces the column with pd.to_numeric (unparsable values are rejected)
+#   required - reject rows where the value is missing
+#   min/max  - inclusive bounds
+#   unique   - keep only the first occurrence of each value
+LIFE_EXPECTANCY_BOUNDS = (40, 100)
+
+
+def demographics_schema(life_expectancy_bounds=LIFE_EXPECTANCY_BOUNDS):
+    """
+    A function that builds the demographics schema
+    :param life_expectancy_bounds: the (min, max) accepted for the three life expectancies
+    :return: the schema
+    """
+    lower, upper = life_expectancy_bounds
+    schema = {col: {"type": "numeric", "required": True, "min": lower, "max": upper}
+              for col in ["LifeExpectancy Both", "LifeExpectancy Female", "LifeExpectancy Male"]}
+    for col in ["UrbanPopulation Percentage", "UrbanPopulation Absolute", "Population Density"]:
+        schema[col] = {"type": "numeric", "required": True}
+    return schema
+
+
+DEMOGRAPHICS_SCHEMA = demographics_schema()
+
+GDP_SCHEMA = {
+    "GDP_per_capita_PPP": {"type": "numeric", "required": True},
+    "Country": {"required": True, "unique": True},
+}
+
+POPULATION_SCHEMA = {
+    "Population": {"type": "numeric", "required": True},
+    "Country": {"required": True, "unique": True},
+}
+
+
+def validate(df, schema):
+    """
+    A function that compiles a schema into a single boolean mask over the DataFrame.
+    Numeric columns are coerced in place, no filtered copy of the frame is made.
+    :param df: the DataFrame to validate
+    :param schema: a dict mapping column names to their rules
+    :return: the mask of valid rows and a dict mapping each rule to its failing rows
+    """
+    for col in schema:
+        if col not in df.columns:
+            raise KeyError(f"Column '{col}' not found in the dataset.")
+
+    failures = {}
+    for col, rules in schema.items():
+        values = df[col]
+        missing = values.isna()
+        if rules.get("type") == "numeric":
+            values = pd.to_numeric(values, errors="coerce")
+            failures[f"{col}: not numeric"] = values.isna() & ~missing
+            df[col] = values
+        if rules.get("required"):
+            failures[f"{col}: missing"] = missing
+        if "min" in rules:
+            failures[f"{col}: below {rules['min']}"] = values < rules["min"]
+        if "max" in rules:
+            failures[f"{col}: above {rules['max']}"] = values > rules["max"]
+
+    mask = pd.Series(True, index=df.index)
+    for failed in failures.values():
+        mask &= ~failed
+
+    # Uniqueness is only checked among the rows that passed every other rule,
+    # so a rejected row never shadows a later valid one.
+    for col, rules in schema.items():
+        if rules.get("unique"):
+            failed = df[col].where(mask).duplicated(keep="first") & mask
+            failures[f"{col}: duplicate"] = failed
+            mask &= ~failed
+
+    return mask, failures
+
+
+def quarantine(df, mask, failures, dataset_name):
+    """
+    A function that builds the quarantine entries of the rejected rows
+    :param df: the validated DataFrame
+    :param mask: the mask of valid rows returned by validate()
+    :param failures: the failing rows of each rule returned by validate()
+    :param dataset_name: the name of the dataset, used to label the entries
+    :return: a DataFrame with one line per rejected row and the reasons it failed
+    """
+    rejected = ~mask
+    reasons = pd.Series("", index=df.index[rejected], dtype=object)
+    for rule, failed in failures.items():
+        hit = failed[rejected]
+        reasons[hit] = reasons[hit] + rule + "; "
+
+    return pd.DataFrame({
+        "Dataset": dataset_name,
+        "Row": df.index[rejected],
+        "Country": df.loc[rejected, "Country"].values if "Country" in df.columns else None,
+        "Reasons": reasons.str.rstrip("; ").values,
+    })
+
+
+def write_quarantine_report(entries, output_dir="../output"):
+    """
+    A function that saves all the quarantined rows into a single report
+    :param entries: a list of DataFrames returned by quarantine()
+    :param output_dir: the output directory
+    :return: the path of the report
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, "quarantine_report.csv")
+    columns = ["Dataset", "Row", "Country", "Reasons"]
+    entries = [entry for entry in entries if not entry.empty]
+    report = pd.concat(entries, ignore_index=True) if entries else pd.DataFrame(columns=columns)
+    save_csv(report, report_path, index=False)
+    print(f"Number of quarantined rows: {report.shape[0]}")
+    return report_path